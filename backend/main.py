@@ -1,8 +1,16 @@
-from typing import Any, Dict, List, Optional
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
 from pydantic import BaseModel
 from bson import ObjectId
+from pymongo import ReturnDocument
 import os
 
 from schemas import (
@@ -12,18 +20,20 @@ from schemas import (
     CreateOrderRequest, UpdateOrderStatus,
     PaymentCreateRequest, PaymentCreateResponse, PaymentConfirmRequest,
 )
-from database import db, create_document, get_documents  # Provided by the environment
+from database import db, create_document  # Provided by the environment
 
-app = FastAPI(title="THE HooK API", version="1.0.0")
+app = FastAPI(title="THE HooK API", version="1.0.0", default_response_class=ORJSONResponse)
 
-# CORS to allow frontend
+# CORS to allow frontend; wildcard origins cannot be combined with
+# credentials, so only send credentials when a concrete origin is configured
 frontend_url = os.getenv("FRONTEND_URL", "*")
+origins = [frontend_url] if frontend_url and frontend_url != "*" else ["*"]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*", frontend_url],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=origins,
+    allow_credentials=origins != ["*"],
+    allow_methods=["GET", "POST", "PATCH"],
+    allow_headers=["content-type", "authorization"],
 )
 
 
@@ -32,6 +42,88 @@ class IdModel(BaseModel):
     id: str
 
 
+def _oid(value: str, detail: str = "Invalid id") -> ObjectId:
+    # is_valid is a plain hex check, so bad ids 400 without the cost of
+    # raising and catching an InvalidId on every request
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=detail)
+    return ObjectId(value)
+
+
+# Menu items change rarely, so keep a small in-process TTL cache of prices
+# (and of the /menu listing) instead of re-reading Mongo on every request.
+_MENU_CACHE_TTL = 60.0
+_MENU_CACHE_MAX = 4096
+_price_cache: Dict[ObjectId, Tuple[float, float]] = {}  # oid -> (price, expires_at)
+_menu_list_cache: Dict[Tuple[Optional[str], int], Tuple[List[Dict[str, Any]], float]] = {}
+
+
+def _invalidate_menu_cache() -> None:
+    _price_cache.clear()
+    _menu_list_cache.clear()
+
+
+class _PriceLoader:
+    """DataLoader-style batcher: price lookups queued during the same
+    event-loop tick coalesce into one $in query, so concurrent order
+    creations share a single Mongo fetch instead of one each."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[ObjectId, asyncio.Future] = {}
+        self._scheduled = False
+
+    def load(self, oid: ObjectId) -> "asyncio.Future":
+        fut = self._pending.get(oid)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._pending[oid] = fut
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(lambda: asyncio.ensure_future(self._flush()))
+        return fut
+
+    async def _flush(self) -> None:
+        self._scheduled = False
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            cursor = db["menuitem"].find({"_id": {"$in": list(pending)}}, {"price": 1})
+            prices = {d["_id"]: float(d.get("price", 0)) async for d in cursor}
+        except Exception as exc:
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for oid, fut in pending.items():
+            if not fut.done():
+                fut.set_result(prices.get(oid))  # None when the item is missing
+
+
+_price_loader = _PriceLoader()
+
+
+# Projections limited to the fields the *Out response models serialize,
+# so list endpoints don't fetch/decode anything they won't return
+_USER_FIELDS = {"name": 1, "email": 1, "phone": 1, "addresses": 1}
+_MENU_FIELDS = {"name": 1, "category": 1, "description": 1, "price": 1, "image_url": 1, "veg": 1}
+_ORDER_FIELDS = {
+    "customer_id": 1, "guest_details": 1, "items": 1, "total_amount": 1,
+    "payment_status": 1, "delivery_status": 1, "notes": 1,
+}
+
+
+@app.on_event("startup")
+async def create_indexes():
+    # list_menu filters by category and seed_menu looks up by name; without
+    # these both are full collection scans
+    await db["menuitem"].create_index("category")
+    await db["menuitem"].create_index("name", unique=True)
+    await db["order"].create_index([("delivery_status", 1), ("_id", -1)])
+    await db["order"].create_index("payment_status")
+
+
 # Health & DB test
 @app.get("/test")
 async def test() -> Dict[str, Any]:
@@ -43,51 +135,73 @@ async def test() -> Dict[str, Any]:
 # Users
 @app.post("/users", response_model=UserOut)
 async def create_user(user: User):
-    user_dict = user.dict()
+    user_dict = user.model_dump()
     inserted = await create_document("user", user_dict)
-    inserted["_id"] = str(inserted["_id"])  # ensure string id
     return inserted
 
 @app.get("/users", response_model=List[UserOut])
 async def list_users(limit: int = 50):
-    docs = await get_documents("user", {}, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # cast id
-    return docs
+    return await db["user"].find({}, _USER_FIELDS).to_list(limit)
 
 
 # Menu
 @app.post("/menu", response_model=MenuItemOut)
 async def create_menu_item(item: MenuItem):
-    inserted = await create_document("menuitem", item.dict())
-    inserted["_id"] = str(inserted["_id"])  # cast id
+    inserted = await create_document("menuitem", item.model_dump())
+    _invalidate_menu_cache()
     return inserted
 
 @app.get("/menu", response_model=List[MenuItemOut])
 async def list_menu(category: Optional[str] = None, limit: int = 200):
+    key = (category, limit)
+    now = time.monotonic()
+    cached = _menu_list_cache.get(key)
+    if cached and cached[1] > now:
+        return cached[0]
+
     filter_q: Dict[str, Any] = {}
     if category:
         filter_q["category"] = category
-    docs = await get_documents("menuitem", filter_q, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # cast id
+    docs = await db["menuitem"].find(filter_q, _MENU_FIELDS).to_list(limit)
+    if len(_menu_list_cache) >= _MENU_CACHE_MAX:
+        _menu_list_cache.clear()
+    _menu_list_cache[key] = (docs, now + _MENU_CACHE_TTL)
     return docs
 
 
 # Orders
 async def compute_total(items: List[OrderItem]) -> float:
-    total = 0.0
-    for it in items:
-        # fetch each menu item price
-        try:
-            oid = ObjectId(it.menu_item_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid menu_item_id")
-        doc_list = await get_documents("menuitem", {"_id": oid}, 1)
-        if not doc_list:
-            raise HTTPException(status_code=404, detail="Menu item not found")
-        price = float(doc_list[0].get("price", 0))
-        total += price * it.quantity
+    # Validate all ids up front, then resolve prices through the TTL cache;
+    # only cache misses hit Mongo, in a single $in query
+    oids = [_oid(it.menu_item_id, "Invalid menu_item_id") for it in items]
+
+    # Orders often repeat the same item across lines; resolve each id once
+    unique_oids = set(oids)
+
+    now = time.monotonic()
+    prices: Dict[ObjectId, float] = {}
+    missing: List[ObjectId] = []
+    for oid in unique_oids:
+        cached = _price_cache.get(oid)
+        if cached and cached[1] > now:
+            prices[oid] = cached[0]
+        else:
+            missing.append(oid)
+
+    if missing:
+        if len(_price_cache) >= _MENU_CACHE_MAX:
+            _price_cache.clear()
+        fetched = await asyncio.gather(*(_price_loader.load(oid) for oid in missing))
+        for oid, price in zip(missing, fetched):
+            if price is None:
+                continue
+            prices[oid] = price
+            _price_cache[oid] = (price, now + _MENU_CACHE_TTL)
+
+    if len(prices) != len(unique_oids):
+        raise HTTPException(status_code=404, detail="Menu item not found")
+
+    total = sum(prices[oid] * it.quantity for oid, it in zip(oids, items))
     return round(total, 2)
 
 
@@ -101,39 +215,41 @@ async def create_order(payload: CreateOrderRequest):
         guest_details=payload.guest_details,
         items=payload.items,
         total_amount=total_amount,
-    ).dict()
+    ).model_dump()
 
     inserted = await create_document("order", order_data)
-    inserted["_id"] = str(inserted["_id"])  # cast id
     return inserted
 
 
-@app.get("/orders", response_model=List[OrderOut])
+@app.get("/orders")
 async def list_orders(limit: int = 100):
-    docs = await get_documents("order", {}, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # cast id
-    return docs
+    # Stream NDJSON straight off the cursor: constant memory per request
+    # instead of materializing, validating, and serializing the whole list
+    async def gen():
+        async for d in db["order"].find({}, _ORDER_FIELDS).limit(limit):
+            d["_id"] = str(d["_id"])  # cast id
+            yield orjson.dumps(d) + b"\n"
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
 
 
 @app.patch("/orders/{order_id}", response_model=OrderOut)
 async def update_order_status(order_id: str, status: UpdateOrderStatus):
-    try:
-        oid = ObjectId(order_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid order id")
+    oid = _oid(order_id, "Invalid order id")
 
-    updates: Dict[str, Any] = {k: v for k, v in status.dict().items() if v is not None}
+    updates: Dict[str, Any] = status.model_dump(exclude_none=True, exclude_unset=True)
     if not updates:
         raise HTTPException(status_code=400, detail="No updates provided")
 
     # Manual update via db
     result = await db["order"].find_one_and_update(
-        {"_id": oid}, {"$set": updates}, return_document=True
+        {"_id": oid},
+        {"$set": updates},
+        projection=_ORDER_FIELDS,
+        return_document=ReturnDocument.AFTER,
     )
     if not result:
         raise HTTPException(status_code=404, detail="Order not found")
-    result["_id"] = str(result["_id"])  # cast id
     return result
 
 
@@ -141,20 +257,20 @@ async def update_order_status(order_id: str, status: UpdateOrderStatus):
 @app.post("/payments/create", response_model=PaymentCreateResponse)
 async def create_payment(pay: PaymentCreateRequest):
     # In real flow, call Razorpay Order API and return order/payment id
-    payment_id = f"mock_{os.urandom(6).hex()}"
+    payment_id = f"mock_{secrets.token_hex(6)}"
     return PaymentCreateResponse(payment_id=payment_id, amount=pay.order_amount, currency=pay.currency)
 
 
 @app.post("/payments/confirm")
 async def confirm_payment(body: PaymentConfirmRequest):
     # In real flow, verify signature and mark order paid
-    try:
-        oid = ObjectId(body.order_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid order id")
+    oid = _oid(body.order_id, "Invalid order id")
 
     updated = await db["order"].find_one_and_update(
-        {"_id": oid}, {"$set": {"payment_status": "paid"}}, return_document=True
+        {"_id": oid},
+        {"$set": {"payment_status": "paid"}},
+        projection=_ORDER_FIELDS,
+        return_document=ReturnDocument.AFTER,
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -162,13 +278,66 @@ async def confirm_payment(body: PaymentConfirmRequest):
     return {"status": "success", "order": updated}
 
 
-# Admin: simple real-time polling endpoint
-@app.get("/admin/orders", response_model=List[OrderOut])
+# Admin: order feed, kept for one-shot fetches; live clients should use the
+# WebSocket below instead of polling this
+@app.get("/admin/orders")
 async def admin_orders(limit: int = 50):
-    docs = await get_documents("order", {}, limit)
+    async def gen():
+        async for d in db["order"].find({}, _ORDER_FIELDS).limit(limit):
+            d["_id"] = str(d["_id"])  # cast id
+            yield orjson.dumps(d) + b"\n"
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+
+# Admin: push order changes over a WebSocket, driven by a Mongo change stream
+# shared across all connected admin tabs
+_admin_sockets: Set[WebSocket] = set()
+_order_watch_task: Optional[asyncio.Task] = None
+
+
+async def _broadcast_order_changes():
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    try:
+        async with db["order"].watch(pipeline, full_document="updateLookup") as stream:
+            async for change in stream:
+                doc = change.get("fullDocument")
+                if not doc:
+                    continue
+                doc["_id"] = str(doc["_id"])  # cast id
+                payload = json.dumps({"type": "order", "order": doc}, default=str)
+                for ws in list(_admin_sockets):
+                    try:
+                        await ws.send_text(payload)
+                    except Exception:
+                        _admin_sockets.discard(ws)
+    except Exception:
+        # Change streams need a replica set; fall back to clients polling
+        pass
+
+
+@app.websocket("/ws/admin/orders")
+async def admin_orders_ws(ws: WebSocket):
+    global _order_watch_task
+    await ws.accept()
+
+    # Initial snapshot, then push changes as they happen
+    docs = await db["order"].find({}, _ORDER_FIELDS).to_list(50)
     for d in docs:
         d["_id"] = str(d["_id"])  # cast id
-    return docs
+    await ws.send_text(json.dumps({"type": "snapshot", "orders": docs}, default=str))
+
+    _admin_sockets.add(ws)
+    if _order_watch_task is None or _order_watch_task.done():
+        _order_watch_task = asyncio.create_task(_broadcast_order_changes())
+
+    try:
+        while True:
+            await ws.receive_text()  # keepalive; client messages are ignored
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _admin_sockets.discard(ws)
 
 
 # Admin: Seed menu with curated items for THE HooK (Kerala non-veg + salads)
@@ -225,15 +394,29 @@ async def seed_menu() -> Dict[str, Any]:
         },
     ]
 
-    created = []
+    # One $in query to find names already seeded, one insert_many for the rest
+    names = [item["name"] for item in defaults]
+    existing = {
+        d["name"]
+        async for d in db["menuitem"].find({"name": {"$in": names}}, {"name": 1})
+    }
+
+    now = datetime.now(timezone.utc)
+    to_insert = []
     skipped = []
     for item in defaults:
-        existing = await db["menuitem"].find_one({"name": item["name"]})
-        if existing:
+        if item["name"] in existing:
             skipped.append(item["name"])
             continue
-        doc = await create_document("menuitem", item)
-        doc["_id"] = str(doc["_id"])  # cast id
-        created.append(doc)
+        # Same timestamps create_document would have stamped
+        to_insert.append({**item, "created_at": now, "updated_at": now})
+
+    created = []
+    if to_insert:
+        res = await db["menuitem"].insert_many(to_insert, ordered=False)
+        for oid, doc in zip(res.inserted_ids, to_insert):
+            doc["_id"] = str(oid)  # cast id
+            created.append(doc)
+        _invalidate_menu_cache()
 
     return {"created": created, "skipped": skipped}
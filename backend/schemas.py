@@ -1,5 +1,19 @@
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
+
+
+class _OutModel(BaseModel):
+    """Base for response models: casts Mongo's ObjectId _id to str during
+    the validation pass instead of in per-endpoint Python loops."""
+
+    id: str = Field(..., alias="_id")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _cast_id(cls, v):
+        return str(v)
 
 
 class Address(BaseModel):
@@ -19,8 +33,8 @@ class User(BaseModel):
     addresses: List[Address] = []
 
 
-class UserOut(User):
-    id: str = Field(..., alias="_id")
+class UserOut(User, _OutModel):
+    pass
 
 
 class MenuItem(BaseModel):
@@ -32,13 +46,13 @@ class MenuItem(BaseModel):
     veg: bool = True
 
 
-class MenuItemOut(MenuItem):
-    id: str = Field(..., alias="_id")
+class MenuItemOut(MenuItem, _OutModel):
+    pass
 
 
 class OrderItem(BaseModel):
     menu_item_id: str
-    quantity: int = 1
+    quantity: int = Field(1, ge=1, le=999)
 
 
 class Order(BaseModel):
@@ -51,8 +65,8 @@ class Order(BaseModel):
     notes: Optional[str] = None
 
 
-class OrderOut(Order):
-    id: str = Field(..., alias="_id")
+class OrderOut(Order, _OutModel):
+    pass
 
 
 class CreateOrderRequest(BaseModel):